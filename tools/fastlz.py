@@ -17,143 +17,134 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import functools
 import logging
+import os
 import tempfile
-from math import ceil
+from collections.abc import Iterator
 from pathlib import Path
 
+from crc32_bzip2 import crc32
 
-LOG = logging.getLogger(__name__)
-
-
-class CompressedStream:
-    def __init__(self, data: bytes) -> None:
-        self._data: bytes = data
-        self._index: int = 0
-
-    def __bytes__(self) -> bytes:
-        return self._data
-
-    def get_index(self) -> int:
-        return self._index
-
-    def inc_index(self, count: int = 1) -> None:
-        self._index += count
-
-    def get_remaining(self) -> int:
-        return len(self._data) - self.get_index()
-
-    def take_one(self) -> int:
-        if self.get_remaining() < 1:
-            raise DecompressionError("Compressed data incomplete at index {}: Requested {}, but only {} remaining".format(self.get_index(), 1, self.get_remaining()))
-
-        value: int = self._data[self.get_index()]
-        self.inc_index()
-        return value
-
-    def take_two_be(self) -> int:
-        if self.get_remaining() < 2:
-            raise DecompressionError("Compressed data incomplete at index {}: Requested {}, but only {} remaining".format(self.get_index(), 2, self.get_remaining()))
 
-        value: int = self.take_one() << 8
-        value += self.take_one()
-        return value
-
-    def take_n_bytes(self, count: int) -> bytes:
-        if self.get_remaining() < count:
-            raise DecompressionError("Compressed data incomplete at index {}: Requested {}, but only {} remaining".format(self.get_index(), count, self.get_remaining()))
-
-        value: bytes = self._data[self.get_index():self.get_index()+count]
-        self.inc_index(count)
-        return value
-
-class DecompressedStream:
-    def __init__(self) -> None:
-        self._data: bytearray = bytearray()
-
-    def __len__(self) -> int:
-        return len(self._data)
-
-    def __bytes__(self) -> bytes:
-        return bytes(self._data)
-
-    def extend(self, data: bytes) -> None:
-        self._data.extend(data)
-
-    def lookback_n_take_m_bytes(self, lookback: int, count: int) -> None:
-        if lookback > len(self):
-            raise DecompressionError("Decompressed data of length {} is not long enough to look back {} bytes".format(len(self), lookback))
-
-        lookback_data: bytes = self._data[-lookback:]
+LOG = logging.getLogger(__name__)
 
-        if lookback < count:
-            extra: int = count - lookback
-            repeats: int = ceil(extra / lookback)
-            lookback_data = lookback_data * (1 + repeats)
+# The longest distance a backreference can look back, which is also the
+# amount of decompressed data that needs to be kept in memory while
+# decompressing.
+MAX_LOOKBACK: int = 1 + 0x1FFF + 0xFFFF
 
-        lookback_data = lookback_data[:count]
-        self.extend(lookback_data)
 
 class DecompressionError(Exception):
     pass
 
 
-def dump(compressed: CompressedStream, decompressed: DecompressedStream) -> None:
-    """Dump the current state of the compressed and decompressed data to temporary files."""
-    with tempfile.TemporaryDirectory(prefix="tdc-decompression-error-", delete=False) as temp_dir:
-        temp_path: Path = Path(temp_dir)
+@functools.cache
+def get_dump_dir() -> Path:
+    """Get the temporary directory that dumps are written to, creating it on first use."""
+    return Path(tempfile.mkdtemp(prefix="tdc-decompression-error-"))
 
-        compressed_filename: Path = temp_path.joinpath("compressed.bad_decompress.bin")
-        with open(compressed_filename, "wb") as f:
-            f.write(bytes(compressed))
-        LOG.warning("Dumped compressed data to \"{}\"".format(compressed_filename))
+def dump(compressed: bytes, decompressed: bytes | bytearray, decompressed_offset: int) -> None:
+    """
+    Dump the compressed data and the decompressed data produced so far to temporary files.
 
-        decompressed_filename: Path = temp_path.joinpath("decompressed.bad_decompress.bin")
-        with open(decompressed_filename, "wb") as f:
-            f.write(bytes(decompressed))
-        LOG.warning("Dumped decompressed data to \"{}\"".format(decompressed_filename))
+    :param compressed: The compressed data.
+    :param decompressed: The decompressed data that's still in memory.
+    :param decompressed_offset: The offset of "decompressed" in the full decompressed data, i.e., the number of bytes that were already yielded and dropped before it.
+    """
+    dump_dir: Path = get_dump_dir()
 
-def extract_bits(value: int) -> tuple[int, int]:
-    assert value >> 8 == 0
+    # Tag both files with the same random ID so multiple dumps can share the directory
+    dump_id: str = os.urandom(4).hex()
 
-    high_three_bits: int = value >> 5
-    low_five_bits: int = value & 0x1F
+    compressed_filename: Path = dump_dir.joinpath("compressed.{}.bad_decompress.bin".format(dump_id))
+    with open(compressed_filename, "wb") as f:
+        f.write(compressed)
+    LOG.warning("Dumped compressed data to \"{}\"".format(compressed_filename))
 
-    return (high_three_bits, low_five_bits)
+    # Only the tail of the decompressed data is still in memory, so record where it starts in the file name
+    decompressed_filename: Path = dump_dir.joinpath("decompressed.{}.offset_{:#x}.bad_decompress.bin".format(dump_id, decompressed_offset))
+    with open(decompressed_filename, "wb") as f:
+        f.write(decompressed)
+    LOG.warning("Dumped decompressed data starting at offset {} to \"{}\"".format(decompressed_offset, decompressed_filename))
 
-def decompress(compressed_bytes: bytes) -> bytes:
-    compressed: CompressedStream = CompressedStream(compressed_bytes)
-    decompressed: DecompressedStream = DecompressedStream()
+def iter_decompress(compressed_bytes: bytes) -> Iterator[bytearray]:
+    """
+    Decompress data, yielding the decompressed data in chunks.
+
+    Only the most recent MAX_LOOKBACK bytes of decompressed data are needed
+    to resolve backreferences, so everything older than that is yielded and
+    dropped from memory. This keeps the working buffer small, so it never has
+    to be reallocated and copied as the decompressed data grows.
+
+    :param compressed_bytes: The compressed data.
+    :return: An iterator of chunks of decompressed data.
+    """
+    # The compressed data is read with plain index arithmetic and the
+    # decompressed data is built up in a single bytearray, since per-byte
+    # method calls dominate the run time of this loop. Reading a single byte
+    # past the end raises an IndexError, so those reads don't need their own
+    # bounds checks.
+    compressed: bytes = compressed_bytes
+    compressed_len: int = len(compressed)
+    decompressed: bytearray = bytearray()
+    flushed_len: int = 0
+    index: int = 0
+
+    flush_threshold: int = 2 * MAX_LOOKBACK
 
     try:
-        header_type: int | None = None
+        if compressed_len == 0:
+            return
+
+        # The first control byte is the header byte, so get the type from its
+        # high three bits. This is handled before the main loop so the loop
+        # doesn't have to check for it on every iteration.
+        header_type: int = compressed[0] >> 5
+        if header_type not in (0b000, 0b001):
+            # Raise an error if the header byte is unsupported
+            raise DecompressionError("Unsupported header byte: {:#04x} at index {}".format(compressed[0], 1))
+
+        # Header is always a literal, not a backreference
+        index = 1
+        literal_length: int = (compressed[0] & 0x1F) + 1
+        if compressed_len - index < literal_length:
+            raise DecompressionError("Compressed data incomplete at index {}: Requested {}, but only {} remaining".format(index, literal_length, compressed_len - index))
+
+        decompressed += compressed[index:index+literal_length]
+        index += literal_length
+
+        while index < compressed_len:
+            if len(decompressed) >= flush_threshold:
+                # Yield everything that can no longer be looked back at
+                flush_len: int = len(decompressed) - MAX_LOOKBACK
+                yield decompressed[:flush_len]
+                del decompressed[:flush_len]
+                flushed_len += flush_len
 
-        while compressed.get_remaining() > 0:
             # Read the next control byte
-            control_byte: int = compressed.take_one()
+            control_byte: int = compressed[index]
+            index += 1
 
             # Extract parts from the control byte
-            copy_length: int
-            length_minus_one_or_offset_high: int
-            copy_length, length_minus_one_or_offset_high = extract_bits(control_byte)
-
-            if header_type is None:
-                # This is the header byte, so get the type from the high three bits
-                header_type = copy_length
-
-                if header_type not in (0b000, 0b001):
-                    # Raise an error if the header byte is unsupported
-                    raise DecompressionError("Unsupported header byte: {:#04x} at index {}".format(control_byte, compressed.get_index()))
-
-                # Header is always a literal, not a backreference
-                copy_length = 0
+            copy_length: int = control_byte >> 5
+            length_minus_one_or_offset_high: int = control_byte & 0x1F
 
             if copy_length == 0:
                 # Get literal length from control byte
-                literal_length: int = length_minus_one_or_offset_high + 1
+                literal_length = length_minus_one_or_offset_high + 1
 
-                # Copy literal bytes from the compressed data
-                decompressed.extend(compressed.take_n_bytes(literal_length))
+                # Copy literal bytes from the compressed data. Literals are at
+                # most 32 bytes long, and slicing bytes that short is cheaper
+                # than creating a memoryview slice to avoid the copy.
+                decompressed += compressed[index:index+literal_length]
+                index += literal_length
+
+                # Slicing doesn't fail on a short read, so this is the only
+                # read that needs an explicit bounds check
+                if index > compressed_len:
+                    index -= literal_length
+                    raise DecompressionError("Compressed data incomplete at index {}: Requested {}, but only {} remaining".format(index, literal_length, compressed_len - index))
 
                 # Go to the next control byte
                 continue
@@ -162,31 +153,74 @@ def decompress(compressed_bytes: bytes) -> bytes:
                 # Handle extended backreference copy length
                 if header_type == 0b000:
                     # Add the next byte to the copy length
-                    copy_length += compressed.take_one()
+                    copy_length += compressed[index]
+                    index += 1
 
-                elif header_type == 0b001:
-                    # Add subsequent bytes, stopping when the first non-0xFF byte is reached
+                else:
+                    # Header type 0b001: Add subsequent bytes, stopping when the first non-0xFF byte is reached
                     value: int = 0xFF
                     while value == 0xFF:
-                        value = compressed.take_one()
+                        value = compressed[index]
+                        index += 1
                         copy_length += value
 
             # Calculate the full offset for the backreference
-            lookback_offset: int = (length_minus_one_or_offset_high << 8) | compressed.take_one()
+            lookback_offset: int = (length_minus_one_or_offset_high << 8) | compressed[index]
+            index += 1
 
-            if header_type == 0b001:
-                # Handle extended offset for the backreference
-                if lookback_offset == 0x1FFF:
-                    lookback_offset += compressed.take_two_be()
+            # Handle extended offset for the backreference. The offset check
+            # comes first since it's almost always false.
+            if lookback_offset == 0x1FFF and header_type == 0b001:
+                lookback_offset += (compressed[index] << 8) | compressed[index+1]
+                index += 2
 
             # Append bytes from the decompressed data to the end of the decompressed data
-            decompressed.lookback_n_take_m_bytes(1 + lookback_offset, 2 + copy_length)
+            lookback: int = 1 + lookback_offset
+            count: int = 2 + copy_length
+            if lookback > len(decompressed):
+                raise DecompressionError("Decompressed data of length {} is not long enough to look back {} bytes".format(len(decompressed), lookback))
+
+            # When the lookback is shorter than the copy, the copy overlaps
+            # the bytes it produces, so the output repeats with a period of
+            # "lookback" bytes. Copying from the same start position each
+            # time doubles the length of each chunk, so the copy only takes a
+            # handful of slices no matter how long it is.
+            start: int = len(decompressed) - lookback
+            while count > 0:
+                lookback_data: bytearray = decompressed[start:start+count]
+                decompressed += lookback_data
+                count -= len(lookback_data)
+
+    except IndexError:
+        dump(compressed, decompressed, flushed_len)
+        raise DecompressionError("Encountered error at compressed index {}: Compressed data incomplete".format(min(index, compressed_len)))
 
     except Exception as exc:
-        dump(compressed, decompressed)
-        raise DecompressionError("Encountered error at compressed index {}: {}".format(compressed.get_index(), exc))
+        dump(compressed, decompressed, flushed_len)
+        raise DecompressionError("Encountered error at compressed index {}: {}".format(index, exc))
+
+    yield decompressed
+
+def decompress_with_crc(compressed_bytes: bytes) -> tuple[bytes, int]:
+    """
+    Decompress data and calculate its CRC-32/BZIP2 in the same pass.
+
+    The chunks of decompressed data are joined at the end, so the output is
+    allocated once at its final size instead of being grown as it is written.
 
-    return bytes(decompressed)
+    :param compressed_bytes: The compressed data.
+    :return: A tuple containing the decompressed data and its CRC.
+    """
+    chunks: list[bytearray] = []
+    crc: int = 0
+    for chunk in iter_decompress(compressed_bytes):
+        crc = crc32(chunk, crc)
+        chunks.append(chunk)
+
+    return (b"".join(chunks), crc)
+
+def decompress(compressed_bytes: bytes) -> bytes:
+    return b"".join(iter_decompress(compressed_bytes))
 
 def compress(data: bytes) -> bytes:
     """
@@ -26,6 +26,7 @@ from typing import BinaryIO
 
 from crc32_bzip2 import crc32
 from fastlz import compress
+from tdc_blocks import BLOCK_HEADER, map_in_order
 
 
 def write_header(output_file: BinaryIO, header_version: int, data_offset: int, header_data: dict) -> None:
@@ -38,9 +39,9 @@ def write_header(output_file: BinaryIO, header_version: int, data_offset: int, h
     :param header_data: A dictionary containing the header data to write.
     :return: None
     """
-    output_file.write(b"TPDC")
-    output_file.write(header_version.to_bytes(2, byteorder="little"))
-    output_file.write(data_offset.to_bytes(4, byteorder="little"))
+    header: bytearray = bytearray(b"TPDC")
+    header += header_version.to_bytes(2, byteorder="little")
+    header += data_offset.to_bytes(4, byteorder="little")
 
     unk1_size: int = {
         0x100: 2,
@@ -54,23 +55,46 @@ def write_header(output_file: BinaryIO, header_version: int, data_offset: int, h
         0x300: 8,
     }[header_version]
 
-    output_file.write(header_data["unk0"].to_bytes(2, byteorder="little"))
-    output_file.write(header_data["unk1"].to_bytes(unk1_size, byteorder="little"))
-    output_file.write(header_data["capture_save_time"].to_bytes(4, byteorder="little"))
-    output_file.write(header_data["data_version"].to_bytes(2, byteorder="little"))
-    output_file.write(header_data["unk3"].to_bytes(4, byteorder="little"))
-    output_file.write(header_data["unk4"].to_bytes(4, byteorder="little"))
-    output_file.write(header_data["unk5"].to_bytes(unk5_size, byteorder="little"))
-    output_file.write(header_data["num_thing"].to_bytes(2, byteorder="little"))
+    header += header_data["unk0"].to_bytes(2, byteorder="little")
+    header += header_data["unk1"].to_bytes(unk1_size, byteorder="little")
+    header += header_data["capture_save_time"].to_bytes(4, byteorder="little")
+    header += header_data["data_version"].to_bytes(2, byteorder="little")
+    header += header_data["unk3"].to_bytes(4, byteorder="little")
+    header += header_data["unk4"].to_bytes(4, byteorder="little")
+    header += header_data["unk5"].to_bytes(unk5_size, byteorder="little")
+    header += header_data["num_thing"].to_bytes(2, byteorder="little")
 
     for item in header_data["thing"]:
-        output_file.write(item["lower"].to_bytes(2, byteorder="little"))
-        output_file.write(item["upper"].to_bytes(2, byteorder="little"))
+        header += item["lower"].to_bytes(2, byteorder="little")
+        header += item["upper"].to_bytes(2, byteorder="little")
 
-    header_len: int = output_file.tell()
-    padding_len: int = data_offset - header_len
+    padding_len: int = data_offset - len(header)
     assert padding_len >= 0
-    output_file.write(bytes([0] * padding_len))
+    header += b"\x00" * padding_len
+
+    output_file.write(header)
+
+def compress_block(block_path: Path) -> tuple[int, bytes]:
+    """
+    Read and compress a block of unpacked data.
+
+    :param block_path: The path to the file containing the decompressed block data.
+    :return: A tuple containing the CRC of the decompressed data and the compressed data.
+    """
+    decompressed: bytes = block_path.read_bytes()
+    return crc32(decompressed), compress(decompressed)
+
+def write_block(output_file: BinaryIO, crc: int, compressed: bytes) -> None:
+    """
+    Write a compressed block to the output file.
+
+    :param output_file: The file object to write the block to.
+    :param crc: The CRC of the decompressed block data.
+    :param compressed: The compressed block data.
+    :return: None
+    """
+    output_file.write(BLOCK_HEADER.pack(len(compressed) << 8, crc))
+    output_file.write(compressed)
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Pack unpacked .tdc data back into a .tdc file.")
@@ -100,22 +124,20 @@ def main() -> None:
     with open(output_file, "wb") as f:
         write_header(f, header_version, data_offset, header_data)
 
-        # Write each block
-        block_count: int = 0
+        # Find each block
+        block_paths: list[Path] = []
         while True:
-            block_path: Path = input_dir / f"block_{block_count}.bin"
+            block_path: Path = input_dir / f"block_{len(block_paths)}.bin"
             if not block_path.exists():
                 break
 
-            with open(block_path, "rb") as block_f:
-                decompressed: bytes = block_f.read()
-                compressed: bytes = compress(decompressed)
-                f.write((len(compressed) << 8).to_bytes(4, byteorder="little"))
-                f.write(crc32(decompressed).to_bytes(4, byteorder="little"))
-                f.write(compressed)
+            block_paths.append(block_path)
 
-            block_count += 1
+        # Compress the blocks in parallel and write them in order
+        for crc, compressed in map_in_order(compress_block, ((block_path,) for block_path in block_paths)):
+            write_block(f, crc, compressed)
 
+        block_count: int = len(block_paths)
         print(f"Packed {block_count} blocks into '{output_file}'.", file=sys.stderr)
 
 
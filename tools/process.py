@@ -23,8 +23,7 @@ import sys
 import tempfile
 from pathlib import Path
 
-from crc32_bzip2 import crc32
-from fastlz import decompress
+from tdc_blocks import decompress_blocks, iter_blocks
 from tdc_data import parse
 
 try:
@@ -46,32 +45,26 @@ def main() -> None:
 
     compressed_len_total: int = 0
     decompressed_len_total: int = 0
-
-    decompressed_data: bytes = b""
+    decompressed_blocks: list[bytes] = []
 
     with open(output_filename, "wb") as output:
+        # Kaitai Struct only parses the "blocks" instance when it is accessed, so
+        # this only parses the header.
         tdc_file: Tdc = Tdc.from_file(args.file)
-        for block in tdc_file.blocks:
-            compressed: bytes = block.data
-            compressed_len_total += len(compressed)
-
-            decompressed: bytes = decompress(compressed)
+        for compressed_len, decompressed in decompress_blocks(iter_blocks(args.file, tdc_file.data_offset)):
+            compressed_len_total += compressed_len
             decompressed_len_total += len(decompressed)
 
-            decompressed_crc: int = crc32(decompressed)
-            match: bool = block.crc32 == decompressed_crc
-            if not match:
-                raise ValueError("CRCs don't match! Expcted 0x{:08x}, got 0x{:08x}".format(block.crc32, decompressed_crc))
-
             output.write(decompressed)
-            print("Wrote {} decompressed bytes to \"{}\"".format(len(decompressed), output_filename), file=sys.stderr)
-
-            decompressed_data += decompressed
+            decompressed_blocks.append(decompressed)
 
         print("Finished writing {} decompressed bytes to \"{}\"".format(decompressed_len_total, output_filename), file=sys.stderr)
 
-        data_ver: int = tdc_file.header.data_version
-        parse(data_ver, decompressed_data)
+    # Join the blocks once at the end instead of growing a buffer block by
+    # block. The output file isn't read back, since it might not be a regular
+    # file.
+    data_ver: int = tdc_file.header.data_version
+    parse(data_ver, b"".join(decompressed_blocks))
 
     print("Decompressed {} bytes from {} compressed bytes (compression ratio: {:.02f}%)".format(decompressed_len_total, compressed_len_total, (compressed_len_total*100)/decompressed_len_total), file=sys.stderr)
 
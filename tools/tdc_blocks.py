@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# tdc_blocks.py - A library for handling the compressed blocks in TPDC capture files
+# Copyright (C) 2025  Forest Crossman <cyrozap@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import os
+import struct
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from fastlz import decompress, decompress_with_crc
+
+
+# The length info (24-bit length and 8-bit unknown value) and CRC of a compressed block.
+BLOCK_HEADER: struct.Struct = struct.Struct("<II")
+
+
+def iter_blocks(tdc_path: str, data_offset: int) -> Iterator[tuple[int, bytes]]:
+    """
+    Read the compressed blocks from a .tdc file.
+
+    This only reads the fields of each block that are actually used, which
+    avoids building a tree of Kaitai Struct objects for every block.
+
+    :param tdc_path: The path to the .tdc file.
+    :param data_offset: The offset of the first block in the file.
+    :return: An iterator of tuples containing the CRC and the compressed data of each block.
+    """
+    with open(tdc_path, "rb") as f:
+        f.seek(data_offset)
+        while True:
+            block_offset: int = f.tell()
+            block_header: bytes = f.read(BLOCK_HEADER.size)
+            if not block_header:
+                break
+
+            if len(block_header) < BLOCK_HEADER.size:
+                raise ValueError("Block header at offset {} is truncated".format(block_offset))
+
+            length_info: int
+            crc: int
+            length_info, crc = BLOCK_HEADER.unpack(block_header)
+
+            compressed_len: int = length_info >> 8
+            compressed: bytes = f.read(compressed_len)
+            if len(compressed) < compressed_len:
+                raise ValueError("Block data at offset {} is truncated: Expected {} bytes, got {}".format(block_offset, compressed_len, len(compressed)))
+
+            yield (crc, compressed)
+
+def decompress_block(index: int, block_crc: int | None, compressed: bytes) -> bytes:
+    """
+    Decompress a block and check its CRC.
+
+    :param index: The index of the block in the file, for error messages.
+    :param block_crc: The CRC of the decompressed data, as stored in the block, or None to skip the check.
+    :param compressed: The compressed data of the block.
+    :return: The decompressed data.
+    """
+    if block_crc is None:
+        return decompress(compressed)
+
+    decompressed: bytes
+    decompressed_crc: int
+    decompressed, decompressed_crc = decompress_with_crc(compressed)
+
+    if block_crc != decompressed_crc:
+        raise ValueError("CRC mismatch for block {}: expected 0x{:08X}, got 0x{:08X}".format(index, block_crc, decompressed_crc))
+
+    return decompressed
+
+def get_expected_crc(block_crc: int, no_verify: bool) -> int | None:
+    """
+    Get the CRC to check a block against.
+
+    A CRC of zero means that no CRC was recorded for the block.
+
+    :param block_crc: The CRC of the decompressed data, as stored in the block.
+    :param no_verify: Whether CRC checking was disabled.
+    :return: The CRC to check the decompressed data against, or None if it shouldn't be checked.
+    """
+    if no_verify or block_crc == 0:
+        return None
+
+    return block_crc
+
+def map_in_order[T](fn: Callable[..., T], items: Iterable[tuple]) -> Iterator[T]:
+    """
+    Call a function on each item in a pool of worker processes.
+
+    Only a few items are kept in flight at once, so memory use stays bounded,
+    and if a call fails, the items that haven't started yet are cancelled
+    instead of being processed for nothing.
+
+    :param fn: The function to call. It must be defined at the top level of a module, so it can be sent to the workers.
+    :param items: The arguments to call the function with, one tuple per call.
+    :return: An iterator of the results, in the same order as the items.
+    """
+    max_pending: int = 2 * (os.cpu_count() or 1)
+    with ProcessPoolExecutor() as executor:
+        try:
+            pending: deque[Future[T]] = deque()
+            for args in items:
+                pending.append(executor.submit(fn, *args))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+
+def decompress_blocks(blocks: Iterable[tuple[int | None, bytes]]) -> Iterator[tuple[int, bytes]]:
+    """
+    Decompress blocks in parallel.
+
+    :param blocks: The CRC (or None to skip the check) and compressed data of each block.
+    :return: An iterator of tuples containing the compressed length and the decompressed data of each block, in order.
+    """
+    # map_in_order() takes the blocks and returns the results in the same
+    # order, so the compressed lengths can be queued up alongside them.
+    compressed_lens: deque[int] = deque()
+
+    def block_args() -> Iterator[tuple[int, int | None, bytes]]:
+        for index, (block_crc, compressed) in enumerate(blocks):
+            compressed_lens.append(len(compressed))
+            yield (index, block_crc, compressed)
+
+    for decompressed in map_in_order(decompress_block, block_args()):
+        yield (compressed_lens.popleft(), decompressed)
@@ -19,20 +19,82 @@
 
 import math
 import struct
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import NamedTuple
 
 
+# Little-endian unsigned integer decoders for the integer sizes that struct supports.
+UINT_LE_STRUCTS: dict[int, struct.Struct] = {
+    1: struct.Struct("<B"),
+    2: struct.Struct("<H"),
+    4: struct.Struct("<I"),
+    8: struct.Struct("<Q"),
+}
+
+# The index and Unk2 fields at the start of Block 0.
+BLOCK_0_HEADER: struct.Struct = struct.Struct("<IH")
+
+# The tag and size of a TV record. The size includes the header itself.
+TV_RECORD_HEADER: struct.Struct = struct.Struct("<HI")
+
+# The value of a TV record with tag 0x0000: Unk5, timestamp, and length.
+RECORD_0000: struct.Struct = struct.Struct("<HQI")
+
+# The layout of Block 5, for each data version that added fields to it, from newest to oldest.
+BLOCK_5_STRUCTS: tuple[tuple[int, struct.Struct], ...] = (
+    (0x010A, struct.Struct("<IIIIQIBIIIBBB")),
+    (0x0108, struct.Struct("<IIIIQIBIIIBB")),
+    (0x0104, struct.Struct("<IIIIQIBIIIB")),
+    (0x0103, struct.Struct("<IIIIQIBIII")),
+    (0x0000, struct.Struct("<IIIIQIBII")),
+)
+
+# The protocol and size fields at the start of Block 6.
+BLOCK_6_HEADER: struct.Struct = struct.Struct("<II")
+
+
 class ParserError(Exception):
     pass
 
+def request_error(what: str, index: int, count: int, remaining: int) -> ParserError:
+    """
+    Create the error for a request of "count" bytes that can't be satisfied.
+
+    :param what: What was being read, for the error message.
+    :param index: The index the read started at.
+    :param count: The number of bytes requested.
+    :param remaining: The number of bytes remaining at the index.
+    :return: The error to raise.
+    """
+    if count < 0:
+        return ParserError("Cannot request {} bytes--length must be positive".format(count))
+
+    return ParserError("{} incomplete at index {}: Requested {}, but only {} remaining".format(what, index, count, remaining))
+
+def check_available(data_len: int, index: int, count: int) -> int:
+    """
+    Check that a number of bytes can be read from the data at some index.
+
+    :param data_len: The length of the data.
+    :param index: The index to start reading at.
+    :param count: The number of bytes to read.
+    :return: The index just past the bytes to read.
+    """
+    end: int = index + count
+    if count < 0 or end > data_len:
+        raise request_error("Data", index, count, data_len - index)
+
+    return end
+
 class Data:
-    def __init__(self, data: bytes) -> None:
-        self._data: bytes = data
+    def __init__(self, data: memoryview) -> None:
+        self._data: memoryview = data
         self._index: int = 0
 
     def __bytes__(self) -> bytes:
-        return self._data
+        return bytes(self._data)
 
     def get_index(self) -> int:
         return self._index
@@ -44,50 +106,70 @@ class Data:
         return len(self._data) - self.get_index()
 
     def take_le(self, count: int) -> int:
-        return int.from_bytes(self.take_bytes(count), byteorder="little")
+        index: int = self._index
+        end: int = check_available(len(self._data), index, count)
+
+        value: int
+        unpacker: struct.Struct | None = UINT_LE_STRUCTS.get(count)
+        if unpacker is not None:
+            value = unpacker.unpack_from(self._data, index)[0]
+        else:
+            value = int.from_bytes(self._data[index:end], byteorder="little")
 
-    def take_bytes(self, count: int) -> bytes:
-        if count < 0:
-            raise ParserError("Cannot request {} bytes--length must be positive".format(count))
+        self._index = end
+        return value
 
-        if self.get_remaining() < count:
-            raise ParserError("Data incomplete at index {}: Requested {}, but only {} remaining".format(self.get_index(), count, self.get_remaining()))
+    def take_bytes(self, count: int) -> memoryview:
+        index: int = self._index
+        end: int = check_available(len(self._data), index, count)
 
-        value: bytes = self._data[self.get_index():self.get_index()+count]
-        self.inc_index(count)
+        self._index = end
+        return self._data[index:end]
+
+    def take_remaining_bytes(self) -> memoryview:
+        value: memoryview = self._data[self._index:]
+        self._index = len(self._data)
         return value
 
-    def take_remaining_bytes(self) -> bytes:
-        count: int = self.get_remaining()
-        return self.take_bytes(count)
+@dataclass
+class ParserState:
+    # The sample rate from the most recent Block 5, if any.
+    sample_rate_sps: int | None = None
 
 class TVRecord(NamedTuple):
     tag: int
-    value: bytes
+    value: memoryview
 
 
 def format_timestamp(nanoseconds: int) -> str:
-    # Convert nanoseconds to total seconds
-    total_seconds: int = nanoseconds // 1_000_000_000
+    # Split nanoseconds into total seconds and remaining nanoseconds
+    total_seconds, remaining_ns = divmod(nanoseconds, 1_000_000_000)
 
     # Calculate hours, minutes, and seconds
-    hours: int = total_seconds // 3600
-    minutes: int = (total_seconds % 3600) // 60
-    seconds: int = total_seconds % 60
-
-    # Calculate remaining nanoseconds after extracting seconds
-    remaining_ns: int = nanoseconds % 1_000_000_000
+    hours, remaining_seconds = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(remaining_seconds, 60)
 
     # Extract milliseconds, microseconds, and remaining nanoseconds
-    milliseconds: int = remaining_ns // 1_000_000
-    microseconds: int = (remaining_ns % 1_000_000) // 1_000
-    nanos: int = remaining_ns % 1_000
+    milliseconds, remaining_ns = divmod(remaining_ns, 1_000_000)
+    microseconds, nanos = divmod(remaining_ns, 1_000)
 
     # Format the time string
     formatted_time: str = f"{hours:02}:{minutes:02}:{seconds:02}.{milliseconds:03}.{microseconds:03}.{nanos:03}"
 
     return formatted_time
 
+def format_unix_time(seconds: int) -> str:
+    """
+    Convert a Unix timestamp to an ISO 8601 string in the local time zone.
+
+    The local UTC offset is looked up for each timestamp rather than once at
+    startup, since it depends on whether DST was in effect at that time.
+
+    :param seconds: The number of seconds since the Unix epoch.
+    :return: The formatted timestamp string.
+    """
+    return datetime.fromtimestamp(seconds, timezone.utc).astimezone().isoformat()
+
 def format_time_samples(samples: int, sample_rate_sps: int | None) -> str:
     """
     Convert samples and sample rate to a timestamp/duration string.
@@ -103,10 +185,10 @@ def format_time_samples(samples: int, sample_rate_sps: int | None) -> str:
     ns = (samples * 1_000_000_000) // sample_rate_sps
     return format_timestamp(ns)
 
-def record_0000_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_0000_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) == 14
 
-    unk5, timestamp_samples, length_samples = struct.unpack("<HQI", value)
+    unk5, timestamp_samples, length_samples = RECORD_0000.unpack(value)
 
     info: str = f"(Unk5: {unk5:#06x}"
     info += f", Timestamp: {format_time_samples(timestamp_samples, sample_rate_sps)}"
@@ -115,7 +197,7 @@ def record_0000_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     return info
 
-def record_0300_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_0300_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     unk_0300: int = struct.unpack("<I", value)[0]
 
     info: str = f"{unk_0300:#010x}"
@@ -137,7 +219,7 @@ def record_0300_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     return info
 
-def record_030f_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_030f_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) == 5
 
     event_idx: int = value[0]
@@ -173,7 +255,7 @@ def record_030f_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     return info
 
-def record_031a_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_031a_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) >= 4 + 1 + 1
 
     data: Data = Data(value)
@@ -183,52 +265,52 @@ def record_031a_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     assert 4 + symbol_count + kd_byte_count == len(value)
 
-    symbols: bytes = data.take_bytes(symbol_count)
-    kd_info: bytes = data.take_bytes(kd_byte_count)
+    symbols: memoryview = data.take_bytes(symbol_count)
+    kd_info: memoryview = data.take_bytes(kd_byte_count)
 
     assert data.get_remaining() == 0
 
     return f"{symbols.hex()}, {kd_info.hex()}"
 
-def record_031b_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_031b_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) >= 4 + 20 + 3
 
     data: Data = Data(value)
 
     unk0: int = data.take_le(4)
-    symbols: bytes = data.take_bytes(20)
-    kd_info: bytes = data.take_bytes(3)
+    symbols: memoryview = data.take_bytes(20)
+    kd_info: memoryview = data.take_bytes(3)
 
     assert data.get_remaining() == 0
 
     return f"{unk0:#010x}, {symbols.hex()}, {kd_info.hex()}"
 
-def record_031c_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_031c_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) >= 8 + 1
 
     data: Data = Data(value)
 
-    symbols: bytes = data.take_bytes(8)
-    kd_info: bytes = data.take_bytes(1)
+    symbols: memoryview = data.take_bytes(8)
+    kd_info: memoryview = data.take_bytes(1)
 
     assert data.get_remaining() == 0
 
     return f"{symbols.hex()}, {kd_info.hex()}"
 
-def record_031d_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_031d_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) == 4 + 20 + 3
 
     data: Data = Data(value)
 
     unk0: int = data.take_le(4)
-    symbols: bytes = data.take_bytes(20)
-    kd_info: bytes = data.take_bytes(3)
+    symbols: memoryview = data.take_bytes(20)
+    kd_info: memoryview = data.take_bytes(3)
 
     assert data.get_remaining() == 0
 
     return f"{unk0:#010x}, {symbols.hex()}, {kd_info.hex()}"
 
-def record_0339_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_0339_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) == 1
 
     event_idx: int = value[0]
@@ -248,7 +330,7 @@ def record_0339_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     return info
 
-def record_033a_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_033a_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     # LTSSM Transition
     assert len(value) == 2
     prev_state: int = value[0]
@@ -281,7 +363,7 @@ def record_033a_handler(value: bytes, sample_rate_sps: int | None) -> str:
     new_state_str: str = states.get(new_state, f"0x{new_state:02X}")
     return f"{value.hex()} ({prev_state_str} -> {new_state_str})"
 
-def record_033b_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_033b_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     assert len(value) == 5
     count, set_type = struct.unpack("<IB", value)
 
@@ -293,7 +375,7 @@ def record_033b_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     return f"{count} {type_string}"
 
-def record_033e_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_033e_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     unk_033e: int = struct.unpack("<H", value)[0]
 
     info: str = f"{unk_033e:#06x}"
@@ -321,7 +403,7 @@ def record_033e_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     return info
 
-def record_0341_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_0341_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     unk_0341: int = struct.unpack("<I", value)[0]
 
     info: str = f"{unk_0341:#010x}"
@@ -349,7 +431,7 @@ def record_0341_handler(value: bytes, sample_rate_sps: int | None) -> str:
 
     return info
 
-def record_default_handler(value: bytes, sample_rate_sps: int | None) -> str:
+def record_default_handler(value: memoryview, sample_rate_sps: int | None) -> str:
     return value.hex()
 
 def handle_block_0_record(record: TVRecord, sample_rate_sps: int | None) -> str:
@@ -376,79 +458,114 @@ def handle_block_0_record(record: TVRecord, sample_rate_sps: int | None) -> str:
 
     return info + f", Value: {formatted_value})"
 
-def handle_block_0(version: int, sample_rate_sps: int | None, data_bytes: bytes) -> None:
-    data = Data(data_bytes)
+def iter_tv_records(data_bytes: memoryview, offset: int) -> Iterator[TVRecord]:
+    """
+    Split a sequence of TV records into their tags and values.
+
+    The record headers are read directly from the data with a precompiled
+    struct instead of going through Data, since there can be many records.
+
+    :param data_bytes: The data containing the records.
+    :param offset: The offset of the first record in the data.
+    :return: An iterator of the records, in order.
+    """
+    data_len: int = len(data_bytes)
+    header_size: int = TV_RECORD_HEADER.size
+
+    while offset < data_len:
+        if data_len - offset < header_size:
+            raise request_error("TV record header", offset, header_size, data_len - offset)
+
+        tag: int
+        size: int
+        tag, size = TV_RECORD_HEADER.unpack_from(data_bytes, offset)
+        if size < header_size:
+            raise ParserError("TV record at index {} has invalid size {}".format(offset, size))
+
+        end: int = offset + size
+        if end > data_len:
+            raise request_error("TV record", offset, size, data_len - offset)
 
-    index: int = data.take_le(4)
-    unk2: int = data.take_le(2)
+        yield TVRecord(tag, data_bytes[offset+header_size:end])
+        offset = end
 
-    records: list[TVRecord] = []
-    while data.get_remaining():
-        tag: int = data.take_le(2)
-        size: int = data.take_le(4) - 6
-        value: bytes = data.take_bytes(size)
-        records.append(TVRecord(tag, value))
+def handle_block_0(version: int, sample_rate_sps: int | None, data_bytes: memoryview) -> None:
+    if len(data_bytes) < BLOCK_0_HEADER.size:
+        raise request_error("Block 0 data", 0, BLOCK_0_HEADER.size, len(data_bytes))
 
-    remaining: bytes = data.take_remaining_bytes()
-    assert len(remaining) == 0
+    index: int
+    unk2: int
+    index, unk2 = BLOCK_0_HEADER.unpack_from(data_bytes)
 
-    info: str = "Block 0"
-    info += f": Index: {index}"
-    info += f", Unk2: {unk2:#06x}"
-    info += ", Records: ["
-    for i, record in enumerate(records):
-        info += handle_block_0_record(record, sample_rate_sps)
-        if i < len(records) - 1:
-            info += ", "
-    info += "]"
+    # Format each record as it's split out instead of collecting the records into a list first.
+    records_str: str = ", ".join(handle_block_0_record(record, sample_rate_sps) for record in iter_tv_records(data_bytes, BLOCK_0_HEADER.size))
+
+    info: str = f"Block 0: Index: {index}, Unk2: {unk2:#06x}, Records: [{records_str}]"
 
     print(info)
 
-def handle_block_5(version: int, data_bytes: bytes) -> int:
-    data = Data(data_bytes)
-
-    unk1: int = data.take_le(4)
-    unk2: int = data.take_le(4)
-    capture_start_time: int = data.take_le(4)
-    capture_end_time: int = data.take_le(4)
-    capture_samples: int = data.take_le(8)
-    sample_rate_sps: int = data.take_le(4)
-    unk7: int = data.take_le(1)
-    unk8: int = data.take_le(4)
-    unk9: int = data.take_le(4)
-
-    info: str = "Block 5"
-    info += f": Unk1: {unk1:#010x}"
-    info += f", Unk2: {unk2:#010x}"
-    info += f", CaptureStartTime: {datetime.fromtimestamp(capture_start_time, timezone.utc).astimezone().isoformat()}"
-    info += f", CaptureEndTime: {datetime.fromtimestamp(capture_end_time, timezone.utc).astimezone().isoformat()}"
-    info += f", CaptureSamples: {capture_samples}"
-    info += f", SampleRateSps: {sample_rate_sps}"
-    info += f", Unk7: {unk7:#04x}"
-    info += f", Unk8: {unk8:#010x}"
-    info += f", Unk9: {unk9:#010x}"
+def get_block_5_struct(version: int) -> struct.Struct:
+    """
+    Get the layout of Block 5 for a given data version.
+
+    :param version: The version of the decompressed data.
+    :return: The struct for the fields of Block 5.
+    """
+    for min_version, block_5_struct in BLOCK_5_STRUCTS:
+        if version >= min_version:
+            return block_5_struct
+
+    raise ParserError("Unsupported data version: {:#06x}".format(version))
+
+def handle_block_5(version: int, data_bytes: memoryview) -> int:
+    block_5_struct: struct.Struct = get_block_5_struct(version)
+    if len(data_bytes) != block_5_struct.size:
+        raise ParserError("Block 5 data has the wrong length for version {:#06x}: Expected {}, got {}".format(version, block_5_struct.size, len(data_bytes)))
+
+    fields: tuple[int, ...] = block_5_struct.unpack(data_bytes)
+
+    unk1: int = fields[0]
+    unk2: int = fields[1]
+    capture_start_time: int = fields[2]
+    capture_end_time: int = fields[3]
+    capture_samples: int = fields[4]
+    sample_rate_sps: int = fields[5]
+    unk7: int = fields[6]
+    unk8: int = fields[7]
+    unk9: int = fields[8]
+
+    info_parts: list[str] = [
+        f"Unk1: {unk1:#010x}",
+        f"Unk2: {unk2:#010x}",
+        f"CaptureStartTime: {format_unix_time(capture_start_time)}",
+        f"CaptureEndTime: {format_unix_time(capture_end_time)}",
+        f"CaptureSamples: {capture_samples}",
+        f"SampleRateSps: {sample_rate_sps}",
+        f"Unk7: {unk7:#04x}",
+        f"Unk8: {unk8:#010x}",
+        f"Unk9: {unk9:#010x}",
+    ]
 
     if version >= 0x0103:
-        unk10 = data.take_le(4)
-        info += f", Unk10: {unk10:#010x}"
+        unk10: int = fields[9]
+        info_parts.append(f"Unk10: {unk10:#010x}")
     if version >= 0x0104:
-        unk11 = data.take_le(1)
-        info += f", Unk11: {unk11:#04x}"
+        unk11: int = fields[10]
+        info_parts.append(f"Unk11: {unk11:#04x}")
     if version >= 0x0108:
-        unk12 = data.take_le(1)
-        info += f", Unk12: {unk12:#04x}"
+        unk12: int = fields[11]
+        info_parts.append(f"Unk12: {unk12:#04x}")
     if version >= 0x010A:
-        unk13 = data.take_le(1)
-        info += f", Unk13: {unk13:#04x}"
+        unk13: int = fields[12]
+        info_parts.append(f"Unk13: {unk13:#04x}")
 
-    remaining_bytes = data.take_remaining_bytes()
-    assert len(remaining_bytes) == 0
+    info: str = "Block 5: " + ", ".join(info_parts)
 
     print(info)
 
     return sample_rate_sps
 
-def handle_block_6(protocol: int, data_bytes: bytes) -> None:
+def handle_block_6(protocol: int, data_bytes: memoryview) -> None:
     protocol_enum = {
         1: "I2C",
         2: "SPI",
@@ -465,34 +582,54 @@ def handle_block_6(protocol: int, data_bytes: bytes) -> None:
 
     print(info)
 
+def parse_block_0(view: memoryview, index: int, version: int, state: ParserState) -> int:
+    end: int = check_available(len(view), index, 3)
+    b0_size: int = int.from_bytes(view[index:end], byteorder="little")
+    index = end
+    end = check_available(len(view), index, b0_size - 4)
+    handle_block_0(version, state.sample_rate_sps, view[index:end])
+    return end
+
+def parse_block_5(view: memoryview, index: int, version: int, state: ParserState) -> int:
+    end: int = check_available(len(view), index, get_block_5_struct(version).size)
+    state.sample_rate_sps = handle_block_5(version, view[index:end])
+    return end
+
+def parse_block_6(view: memoryview, index: int, version: int, state: ParserState) -> int:
+    end: int = check_available(len(view), index, BLOCK_6_HEADER.size)
+    protocol: int
+    b6_size: int
+    protocol, b6_size = BLOCK_6_HEADER.unpack_from(view, index)
+    index = end
+    end = check_available(len(view), index, b6_size)
+    handle_block_6(protocol, view[index:end])
+    return end
+
+# Parsers for each block type. Each one takes the data, the index just past
+# the block's header byte, the data version, and the parser state, and returns
+# the index just past the end of the block.
+BLOCK_PARSERS: dict[int, Callable[[memoryview, int, int, ParserState], int]] = {
+    0: parse_block_0,
+    5: parse_block_5,
+    6: parse_block_6,
+}
+
 def parse(version: int, data_bytes: bytes) -> None:
-    sample_rate_sps: int | None = None
-    data = Data(data_bytes)
-    while data.get_remaining() > 0:
-        header: int = data.take_le(1)
+    state: ParserState = ParserState()
+
+    # Each block is sliced out of a view of the data, so it gets passed to its
+    # handler without being copied first.
+    view: memoryview = memoryview(data_bytes)
+    data_len: int = len(view)
+    index: int = 0
+    while index < data_len:
+        header: int = view[index]
+        index += 1
         # unk: int = header >> 4
         block_type: int = header & 0x0F
 
-        match block_type:
-            case 0:
-                b0_size: int = data.take_le(3)
-                b0_block_data: bytes = data.take_bytes(b0_size - 4)
-                handle_block_0(version, sample_rate_sps, b0_block_data)
-            case 5:
-                b5_block_data: bytes = data.take_bytes(37)
-                if version >= 0x0103:
-                    b5_block_data += data.take_bytes(4)
-                if version >= 0x0104:
-                    b5_block_data += data.take_bytes(1)
-                if version >= 0x0108:
-                    b5_block_data += data.take_bytes(1)
-                if version >= 0x010A:
-                    b5_block_data += data.take_bytes(1)
-                sample_rate_sps = handle_block_5(version, b5_block_data)
-            case 6:
-                protocol: int = data.take_le(4)
-                b6_size: int = data.take_le(4)
-                b6_block_data: bytes = data.take_bytes(b6_size)
-                handle_block_6(protocol, b6_block_data)
-            case _:
-                raise ParserError("Unsupported block type: {:#03x} at index {}".format(block_type, data.get_index()))
+        block_parser: Callable[[memoryview, int, int, ParserState], int] | None = BLOCK_PARSERS.get(block_type)
+        if block_parser is None:
+            raise ParserError("Unsupported block type: {:#03x} at index {}".format(block_type, index))
+
+        index = block_parser(view, index, version, state)
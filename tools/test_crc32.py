@@ -15,7 +15,7 @@
 # PERFORMANCE OF THIS SOFTWARE.
 
 
-from crc32_bzip2 import crc32
+from crc32_bzip2 import crc32, crc32_bytewise
 
 
 def test_crc32_a():
@@ -35,3 +35,18 @@ def test_crc32_e():
 
 def test_crc32_f():
     assert crc32(bytes.fromhex("000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f")) == 0x707e66af
+
+def test_crc32_memoryview():
+    data: bytes = bytes([i for i in range(256)])
+    assert crc32(memoryview(data)[16:]) == crc32(data[16:])
+
+def test_crc32_running():
+    data: bytes = bytes([i for i in range(256)]) * 3
+    assert crc32(data[300:], crc32(data[:300])) == crc32(data)
+
+def test_crc32_bytewise():
+    import os
+    for length in (0, 1, 7, 64, 4099):
+        data: bytes = os.urandom(length)
+        assert crc32_bytewise(data) == crc32(data)
+        assert crc32_bytewise(data[length//2:], crc32_bytewise(data[:length//2])) == crc32(data)
@@ -17,7 +17,8 @@
 
 import pytest
 
-from fastlz import DecompressionError, compress, decompress
+from crc32_bzip2 import crc32
+from fastlz import MAX_LOOKBACK, DecompressionError, compress, decompress, decompress_with_crc
 
 
 def test_decompress_0_a() -> None:
@@ -35,17 +36,18 @@ def test_decompress_0_d() -> None:
 def test_decompress_0_e() -> None:
     import os
     random_data: bytes = os.urandom(16384)
-    random_data_copy: bytes = random_data
-    compressed_data: bytes = bytes.fromhex("1f")
-    compressed_data += random_data[:32]
-    random_data = random_data[32:]
-    while len(random_data) > 0:
-        compressed_data += bytes.fromhex("1f") + random_data[:32]
-        random_data = random_data[32:]
-    compressed_data += bytes.fromhex("ffffff")
-    expected_data = random_data_copy + random_data_copy[-8192:-8192+264]
+    compressed_buf: bytearray = bytearray()
+    for offset in range(0, len(random_data), 32):
+        compressed_buf += b"\x1f"
+        compressed_buf += random_data[offset:offset+32]
+    compressed_buf += bytes.fromhex("ffffff")
+    compressed_data: bytes = bytes(compressed_buf)
+    expected_data = random_data + random_data[-8192:-8192+264]
     assert decompress(compressed_data) == expected_data
 
+def test_decompress_0_f() -> None:
+    assert decompress(bytes.fromhex("01aabbe0ff01")) == bytes.fromhex("aabb") * 133
+
 def test_decompress_1_a() -> None:
     assert decompress(bytes.fromhex("3f000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f")) == bytes.fromhex("000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f")
 
@@ -68,15 +70,14 @@ def test_decompress_1_f() -> None:
 def test_decompress_1_g() -> None:
     import os
     random_data: bytes = os.urandom(16384)
-    random_data_copy: bytes = random_data
-    compressed_data: bytes = bytes.fromhex("3f")
-    compressed_data += random_data[:32]
-    random_data = random_data[32:]
-    while len(random_data) > 0:
-        compressed_data += bytes.fromhex("1f") + random_data[:32]
-        random_data = random_data[32:]
-    compressed_data += bytes.fromhex("fffffeff0102")
-    expected_data = random_data_copy + random_data_copy[-8450:-8450+518]
+    compressed_buf: bytearray = bytearray(b"\x3f")
+    compressed_buf += random_data[:32]
+    for offset in range(32, len(random_data), 32):
+        compressed_buf += b"\x1f"
+        compressed_buf += random_data[offset:offset+32]
+    compressed_buf += bytes.fromhex("fffffeff0102")
+    compressed_data: bytes = bytes(compressed_buf)
+    expected_data = random_data + random_data[-8450:-8450+518]
     assert decompress(compressed_data) == expected_data
 
 def test_decompress_error_a() -> None:
@@ -104,6 +105,16 @@ def test_decompress_error_e() -> None:
     with pytest.raises(DecompressionError):
         decompress(bytes.fromhex("00002001"))
 
+def test_decompress_with_crc_multiple_chunks() -> None:
+    import os
+    random_data: bytes = os.urandom(3 * MAX_LOOKBACK)
+    compressed_data: bytes = compress(random_data) + bytes.fromhex("ffffff")
+    expected_data: bytes = random_data + random_data[-8192:-8192+264]
+    assert decompress_with_crc(compressed_data) == (expected_data, crc32(expected_data))
+
+def test_decompress_with_crc() -> None:
+    assert decompress_with_crc(b"\x24abcde\xe0\x01\x04") == (b"abcdeabcdeabcde", crc32(b"abcdeabcdeabcde"))
+
 def test_compress() -> None:
     import os
     random_data: bytes = os.urandom(16384)
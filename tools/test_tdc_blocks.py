@@ -0,0 +1,44 @@
+# SPDX-License-Identifier: 0BSD
+
+# Copyright (C) 2025 by Forest Crossman <cyrozap@gmail.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for
+# any purpose with or without fee is hereby granted.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE
+# AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL
+# DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR
+# PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER
+# TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+
+
+import pytest
+
+from crc32_bzip2 import crc32
+from fastlz import compress
+from tdc_blocks import decompress_block, get_expected_crc
+
+
+DATA: bytes = b"abcdeabcdeabcde"
+COMPRESSED: bytes = b"\x24abcde\xe0\x01\x04"
+
+
+def test_decompress_block() -> None:
+    assert decompress_block(0, crc32(DATA), COMPRESSED) == DATA
+
+def test_decompress_block_crc_mismatch() -> None:
+    with pytest.raises(ValueError, match="block 3"):
+        decompress_block(3, crc32(DATA) ^ 1, COMPRESSED)
+
+def test_decompress_block_no_crc() -> None:
+    assert decompress_block(0, None, COMPRESSED) == DATA
+    assert decompress_block(0, None, compress(DATA)) == DATA
+
+def test_get_expected_crc() -> None:
+    assert get_expected_crc(0x12345678, False) == 0x12345678
+    assert get_expected_crc(0, False) is None
+    assert get_expected_crc(0x12345678, True) is None
+    assert get_expected_crc(0, True) is None
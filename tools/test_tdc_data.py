@@ -0,0 +1,128 @@
+# SPDX-License-Identifier: 0BSD
+
+# Copyright (C) 2025 by Forest Crossman <cyrozap@gmail.com>
+#
+# Permission to use, copy, modify, and/or distribute this software for
+# any purpose with or without fee is hereby granted.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE
+# AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL
+# DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR
+# PROFITS, WHETHER IN AN ACTION OF CONTRACT, NEGLIGENCE OR OTHER
+# TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
+# PERFORMANCE OF THIS SOFTWARE.
+
+
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from tdc_data import ParserError, handle_block_5, parse
+
+
+# A Block 5 with all of the fields added up to version 0x010A. Older versions
+# use a prefix of it.
+BLOCK_5: bytes = bytes.fromhex(
+    "11111111"  # Unk1
+    "22222222"  # Unk2
+    "00f15365"  # CaptureStartTime: 1700000000
+    "3cf15365"  # CaptureEndTime: 1700000060
+    "15cd5b0700000000"  # CaptureSamples: 123456789
+    "00e1f505"  # SampleRateSps: 100000000
+    "77"  # Unk7
+    "88888888"  # Unk8
+    "99999999"  # Unk9
+    "aaaaaaaa"  # Unk10
+    "bb"  # Unk11
+    "cc"  # Unk12
+    "dd"  # Unk13
+)
+
+BLOCK_5_INFO: str = "Block 5: Unk1: 0x11111111, Unk2: 0x22222222, CaptureStartTime: 2023-11-14T22:13:20+00:00, CaptureEndTime: 2023-11-14T22:14:20+00:00, CaptureSamples: 123456789, SampleRateSps: 100000000, Unk7: 0x77, Unk8: 0x88888888, Unk9: 0x99999999"
+
+
+@pytest.fixture(autouse=True)
+def utc_time_zone(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Format capture times in UTC, so the expected output doesn't depend on the local time zone."""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def block_0(data: bytes) -> bytes:
+    """Wrap Block 0 data in its block header."""
+    return b"\x00" + (4 + len(data)).to_bytes(3, byteorder="little") + data
+
+def check_block_5(version: int, size: int, extra_info: str, capsys: pytest.CaptureFixture[str]) -> None:
+    assert handle_block_5(version, memoryview(BLOCK_5[:size])) == 100_000_000
+    assert capsys.readouterr().out == BLOCK_5_INFO + extra_info + "\n"
+
+    parse(version, b"\x05" + BLOCK_5[:size])
+    assert capsys.readouterr().out == BLOCK_5_INFO + extra_info + "\n"
+
+def test_block_5_0100(capsys: pytest.CaptureFixture[str]) -> None:
+    check_block_5(0x0100, 37, "", capsys)
+
+def test_block_5_0103(capsys: pytest.CaptureFixture[str]) -> None:
+    check_block_5(0x0103, 41, ", Unk10: 0xaaaaaaaa", capsys)
+
+def test_block_5_0104(capsys: pytest.CaptureFixture[str]) -> None:
+    check_block_5(0x0104, 42, ", Unk10: 0xaaaaaaaa, Unk11: 0xbb", capsys)
+
+def test_block_5_0108(capsys: pytest.CaptureFixture[str]) -> None:
+    check_block_5(0x0108, 43, ", Unk10: 0xaaaaaaaa, Unk11: 0xbb, Unk12: 0xcc", capsys)
+
+def test_block_5_010a(capsys: pytest.CaptureFixture[str]) -> None:
+    check_block_5(0x010A, 44, ", Unk10: 0xaaaaaaaa, Unk11: 0xbb, Unk12: 0xcc, Unk13: 0xdd", capsys)
+
+def test_block_0(capsys: pytest.CaptureFixture[str]) -> None:
+    parse(0x010A, block_0(bytes.fromhex("01000000" "0200" "3a03" "08000000" "0a0b" "3412" "06000000")))
+    assert capsys.readouterr().out == "Block 0: Index: 1, Unk2: 0x0002, Records: [(Tag: 0x033a, Value: 0a0b (U0 -> U1)), (Tag: 0x1234)]\n"
+
+def test_block_0_record_0000(capsys: pytest.CaptureFixture[str]) -> None:
+    parse(0x010A, b"\x05" + BLOCK_5 + block_0(bytes.fromhex("00000000" "0000" "0000" "14000000" "0000" "0a00000000000000" "64000000")))
+    assert capsys.readouterr().out.splitlines()[1] == "Block 0: Index: 0, Unk2: 0x0000, Records: [(Tag: 0x0000, Value: (Unk5: 0x0000, Timestamp: 00:00:00.000.000.100, Length: 00:00:00.000.001.000))]"
+
+def test_parse_error_a() -> None:
+    """Block 5 with the wrong length for its version"""
+    with pytest.raises(ParserError):
+        handle_block_5(0x010A, memoryview(BLOCK_5[:43]))
+
+def test_parse_error_b() -> None:
+    """Truncated Block 5"""
+    with pytest.raises(ParserError):
+        parse(0x010A, b"\x05" + BLOCK_5[:43])
+
+def test_parse_error_c() -> None:
+    """Block 0 too short for its header"""
+    with pytest.raises(ParserError):
+        parse(0x010A, block_0(bytes.fromhex("000000")))
+
+def test_parse_error_d() -> None:
+    """TV record size smaller than the record header"""
+    with pytest.raises(ParserError):
+        parse(0x010A, block_0(bytes.fromhex("00000000" "0000" "0000" "05000000")))
+
+def test_parse_error_e() -> None:
+    """Truncated TV record header"""
+    with pytest.raises(ParserError):
+        parse(0x010A, block_0(bytes.fromhex("00000000" "0000" "0000" "0600")))
+
+def test_parse_error_f() -> None:
+    """Truncated TV record value"""
+    with pytest.raises(ParserError):
+        parse(0x010A, block_0(bytes.fromhex("00000000" "0000" "0000" "14000000" "0000")))
+
+def test_parse_error_g() -> None:
+    """Block 0 size larger than the remaining data"""
+    with pytest.raises(ParserError):
+        parse(0x010A, bytes.fromhex("00" "100000" "00000000" "0000"))
+
+def test_parse_error_h() -> None:
+    """Unsupported block type"""
+    with pytest.raises(ParserError):
+        parse(0x010A, b"\x07")
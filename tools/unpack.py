@@ -21,17 +21,18 @@
 import argparse
 import json
 import sys
+from collections.abc import Iterator
 from pathlib import Path
 
-from crc32_bzip2 import crc32
-from fastlz import decompress
 from tdc import Tdc
+from tdc_blocks import decompress_blocks, get_expected_crc, iter_blocks
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Unpack a .tdc file into a directory.")
     parser.add_argument("file", type=str, help="The .tdc file to unpack")
     parser.add_argument("-o", "--output", type=str, help="Output directory name")
+    parser.add_argument("--no-verify", action="store_true", help="Don't check the CRCs of the decompressed blocks")
     args = parser.parse_args()
 
     input_path: Path = Path(args.file)
@@ -74,25 +75,22 @@ def main() -> None:
                 for item in header.thing
             ],
         })
-    with open(metadata_path, "w") as f:
-        json.dump(metadata, f, indent=2)
-
-    # Write each decompressed block
-    for i, block in enumerate(tdc_file.blocks):
-        compressed: bytes = block.data
-        decompressed: bytes = decompress(compressed)
-        expected_crc: int = block.crc32
-        actual_crc: int = crc32(decompressed)
-        if expected_crc != actual_crc:
-            raise ValueError(f"CRC mismatch for block {i}: expected 0x{expected_crc:08X}, got 0x{actual_crc:08X}")
-
+    metadata_path.write_text(json.dumps(metadata, indent=2))
+
+    # Decompress the blocks in parallel and write them out in order. The
+    # blocks are read straight from the file, since Kaitai Struct would build
+    # an object for every block first.
+    blocks: Iterator[tuple[int | None, bytes]] = ((get_expected_crc(block_crc, args.no_verify), compressed) for block_crc, compressed in iter_blocks(args.file, tdc_file.data_offset))
+    block_count: int = 0
+    for i, (_, decompressed) in enumerate(decompress_blocks(blocks)):
         block_path: Path = output_dir / f"block_{i}.bin"
-        with open(block_path, "wb") as f:
-            f.write(decompressed)
+        block_path.write_bytes(decompressed)
 
         print(f"Wrote {len(decompressed)} bytes to {block_path}", file=sys.stderr)
 
-    print(f"Unpacked {len(tdc_file.blocks)} blocks into {output_dir}", file=sys.stderr)
+        block_count += 1
+
+    print(f"Unpacked {block_count} blocks into {output_dir}", file=sys.stderr)
 
 
 if __name__ == "__main__":